@@ -36,10 +36,12 @@ If you want to these or other corpora, run this script.
             ID of merged genotype corpus.
         Accepted Arguments:
             Non-negative integers. If contained in range(1,23), the pre-computed corpora shipped with EpiGEN are overwritten.
+            Existing files of the corpus ``./corpora/<CORPUS_ID>_<POP>`` with other codecs or formats than the generated files are removed,
+            since they would otherwise be read instead of the generated files.
         Effect:
             Together with ``--pop``, this option determines the prefix ``./corpora/<CORPUS_ID>_<POP>`` of the files
             that contain the generated corpus.
-    ``--pops POP POP [POP ...]``    
+    ``--pops POP [POP ...]``    
         Description:
             List of HAPMAP3 population codes of the corpora that should be merged. 
             The size must match the size of the argument passed to ``--corpus-ids``.
@@ -49,14 +51,15 @@ If you want to these or other corpora, run this script.
             Selects the corpora that should be merged and determines the prefix ``./corpora/<CORPUS_ID>_<POP>`` of the files
             that contain the generated corpus. If the list passed to this argument contains only one population code,
             ``<POP>`` is the set to this code. Otherwise, ``<POP>`` is set to ``MIX``. 
-    ``--corpus-ids CORPUS_ID CORPUS_ID [CORPUS_ID ...]``
+    ``--corpus-ids CORPUS_ID [CORPUS_ID ...]``
         Description:
             The IDs of the corpora that should be merged.
         Accepted Arguments:
-            Lists of non-negative integers of size at least 2.
+            Non-empty lists of non-negative integers.
             The size must match the size of the argument passed to ``--pops``.
         Effect:
-            Selects the corpora that should be merged.
+            Selects the corpora that should be merged. If only one corpus is selected and its files already have the format
+            and the compression selected by ``--format`` and ``--codec``, they are copied to the generated corpus.
     ``--append APPEND``
         Description:
             The axis along which the corpora should be merged.
@@ -72,8 +75,43 @@ If you want to these or other corpora, run this script.
         Accepted Arguments:
             None.
         Effect:
-            Determines the suffix ``<SUFFIX>`` of the generated files. If provided, ``<SUFFIX>`` is set to ``json.bz2``.
-            Otherwise, it is set to ``json``.
+            Changes the default of ``--codec`` from "none" to "zstd". The suffix ``<SUFFIX>`` of the generated files is determined 
+            by ``--codec``, so this option has no effect if ``--codec`` is provided.
+    ``--codec CODEC``
+        Description:
+            Codec used to compress the generated output files.
+        Accepted Arguments:
+            "none", "zstd", or "bz2".
+        Default:
+            "zstd" if ``--compress`` is provided, "none" otherwise.
+        Effect:
+            Determines the suffix ``<SUFFIX>`` of the generated files. For "none", ``<SUFFIX>`` is set to ``json``, for "zstd" to ``json.zst``, 
+            and for "bz2" to ``json.bz2``. Zstandard compresses and decompresses the corpora much faster than bzip2 at similar ratios.
+    ``--format FORMAT``
+        Description:
+            Format of the generated genotype data.
+        Accepted Arguments:
+            "json", "bin", or "npy".
+        Default:
+            "json"
+        Effect:
+            For "json", the genotype data is written to ``./corpora/<CORPUS_ID>_<POP>_genotype.<SUFFIX>``.
+            For "bin", it is written to ``./corpora/<CORPUS_ID>_<POP>_genotype.bin`` with 2 bits per genotype,
+            which is roughly 12 times smaller and much faster to write and read than JSON. 
+            For "npy", it is written to ``./corpora/<CORPUS_ID>_<POP>_genotype.npy`` with 1 byte per genotype and
+            SNPs and MAFs are written to compressed NPZ files. Writing NPY files requires a single write of the genotype 
+            instead of encoding every entry as text. Binary and NPY corpora can be re-loaded by this script, 
+            but ``simulate_data.py`` requires JSON corpora.
+    ``--device DEVICE``
+        Description:
+            Device used to compute the MAFs of the generated corpus.
+        Accepted Arguments:
+            "cpu" or "cuda".
+        Default:
+            "cpu"
+        Effect:
+            For "cuda", the minor alleles at each SNP are counted on the GPU, which requires CuPy. 
+            Only pays off for very large corpora, since the genotype has to be transferred to the GPU.
     ``-h, --help``
         Effect:
             Show help message and exit.
@@ -85,6 +123,21 @@ If you want to these or other corpora, run this script.
         Content and Format: 
             (Compressed) JSON file of the form ``[[G_0_0, ..., G_0_<INDS-1>], ..., [G_<SNPS-1>_0, ..., G_<SNPS-1>_<INDS-1>]]``,
             where ``G_S_I`` encodes the number of minor alleles of the individual with index ``I`` at the SNP with index ``S``.
+    *Binary Genotype Data (only if* ``--format bin`` *is provided):*
+        Files:
+            ``./corpora/<CORPUS_ID>_<POP>_genotype.bin`` and ``./corpora/<CORPUS_ID>_<POP>_genotype_shape.json``
+        Content and Format:
+            Binary file with one row of ``ceil(<INDS> / 4)`` bytes for each SNP. The byte at position ``B`` of the row for the SNP with 
+            index ``S`` encodes ``(G_S_4B<<6)|(G_S_4B+1<<4)|(G_S_4B+2<<2)|G_S_4B+3``, rows are padded with zeros. The JSON file is of the 
+            form ``{"num_snps": <SNPS>, "num_inds": <INDS>, "dtype": "uint8", "bits_per_genotype": 2}``.
+    *NPY Genotype Data (only if* ``--format npy`` *is provided):*
+        File:
+            ``./corpora/<CORPUS_ID>_<POP>_genotype.npy``
+        Content and Format:
+            NPY file containing a ``uint8`` array of shape ``(<SNPS>, <INDS>)`` whose entry ``G_S_I`` encodes the number of minor alleles 
+            of the individual with index ``I`` at the SNP with index ``S``. SNPs and MAFs are stored under the keys ``snps`` and ``mafs``
+            in the NPZ files ``./corpora/<CORPUS_ID>_<POP>_snps.npz`` and ``./corpora/<CORPUS_ID>_<POP>_mafs.npz``. The SNPs are stored
+            as a structured array with the fields ``rs``, ``chrom`` (``int8``), ``pos`` (``int32``), ``maj``, and ``min``.
     *SNPs:*
         File:
             ``./corpora/<CORPUS_ID>_<POP>_snps.<SUFFIX>``
@@ -111,7 +164,6 @@ If you want to these or other corpora, run this script.
             ``--global-maf-range`` and ``--disease-maf-range`` of the script ``simulate_data.py``.
 """
 
-from utils.genotype_corpus_merger import GenotypeCorpusMerger as GenCorMerge
 import utils.argparse_checks as checks
 import argparse
 
@@ -131,33 +183,55 @@ def run_script():
     epilo += "\n############################################################################\n"
     parser = argparse.ArgumentParser(description=descr,formatter_class=argparse.RawTextHelpFormatter, epilog=epilo, usage=argparse.SUPPRESS)
     required_args = parser.add_argument_group("requried arguments")
-    required_args.add_argument("--corpus-ids", type=int, nargs="+", required=True, help="IDs of corpora that should be merged.", metavar="CORPUS_ID", action=checks.check_length("--corpus-ids"))
+    required_args.add_argument("--corpus-ids", type=int, nargs="+", required=True, help="IDs of corpora that should be merged.", metavar="CORPUS_ID", action=checks.check_length("--corpus-ids", 1))
     required_args.add_argument("--corpus-id", type=int, required=True, help="ID of generated corpus.", action=checks.check_non_negative("--corpus-id"))
-    required_args.add_argument("--pops", nargs="+", required=True, choices=["ASW","CEU","CEU+TSI","CHD","GIH","JPT+CHB","LWK","MEX","MKK","TSI","MIX"], metavar="POP", help="HAPMAP3 population codes of corpora that should be merged.", action=checks.check_length("--pops"))
+    required_args.add_argument("--pops", nargs="+", required=True, choices=["ASW","CEU","CEU+TSI","CHD","GIH","JPT+CHB","LWK","MEX","MKK","TSI","MIX"], metavar="POP", help="HAPMAP3 population codes of corpora that should be merged.", action=checks.check_length("--pops", 1))
     required_args.add_argument("--append", required=True, help="The axis along which the corpora should be merged.", choices=["SNPS","INDS"])
     optional_args = parser.add_argument_group("optional arguments")
     optional_args.add_argument("--compress", help="Compress generated output files.", action="store_true")
+    optional_args.add_argument("--codec", help="Codec used to compress generated output files.\nDefault: zstd if --compress is provided, none otherwise.", choices=["none","zstd","bz2"])
+    optional_args.add_argument("--format", help="Format of generated genotype data.\nDefault: json.", choices=["json","bin","npy"], default="json")
+    optional_args.add_argument("--device", help="Device used to compute the MAFs.\nDefault: cpu.", choices=["cpu","cuda"], default="cpu")
     args = parser.parse_args()
+    if len(args.corpus_ids) != len(args.pops):
+        parser.error("The arguments \"--corpus-ids\" and \"--pops\" require the same number of arguments.")
+    
+    # Import the merger only after the arguments have been parsed, such that --help and invalid arguments do not pay for importing numpy.
+    from utils.genotype_corpus_merger import GenotypeCorpusMerger as GenCorMerge
     
     print("\n############################################################################")
     print("#################### EpiGEN - merge_genotype_corpora.py ####################\n")
     axis = 0
     if args.append == "INDS":
         axis = 1
-    merger = GenCorMerge(args.corpus_ids, args.pops, args.corpus_id, axis, args.compress)
-    merger.merge_corpora()
-    merger.compute_mafs()
-    merger.dump_corpus()
-    suffix = "json"
-    if args.compress:
-        suffix = "json.bz2"
+    codec = args.codec
+    if codec is None:
+        codec = "none"
+        if args.compress:
+            codec = "zstd"
+    merger = GenCorMerge(args.corpus_ids, args.pops, args.corpus_id, axis, codec, args.format, args.device)
+    if not merger.copy_corpus():
+        if axis == 0:
+            merger.merge_and_dump_streaming()
+        else:
+            merger.merge_corpora()
+            merger.summarize()
+            merger.dump_corpus()
+    suffix = merger.suffix
+    genotype_suffix = suffix
+    snps_suffix = suffix
+    if args.format == "bin":
+        genotype_suffix = "bin"
+    elif args.format == "npy":
+        genotype_suffix = "npy"
+        snps_suffix = "npz"
     print("\n----------------------------------------------------------------------------\n")
     print("Finished merging of genotype corpora.")
     print("The generated data can be found in the ./corpora directory:")
     print("Number of SNPs:\t\t\t" + str(merger.num_snps))
-    print("Genotype data:\t\t\t./corpora/" + str(args.corpus_id) + "_" + merger.pop + "_genotype." + suffix)
-    print("SNPs:\t\t\t\t./corpora/" + str(args.corpus_id) + "_" + merger.pop + "_snps." + suffix)
-    print("MAFs:\t\t\t\t./corpora/" + str(args.corpus_id) + "_" + merger.pop + "_mafs." + suffix)
+    print("Genotype data:\t\t\t./corpora/" + str(args.corpus_id) + "_" + merger.pop + "_genotype." + genotype_suffix)
+    print("SNPs:\t\t\t\t./corpora/" + str(args.corpus_id) + "_" + merger.pop + "_snps." + snps_suffix)
+    print("MAFs:\t\t\t\t./corpora/" + str(args.corpus_id) + "_" + merger.pop + "_mafs." + snps_suffix)
     print("Cumulative MAF distr.:\t\t./corpora/" + str(args.corpus_id) + "_" + merger.pop + "_cum_mafs." + suffix)
     print("Plot of cumulative MAF distr.:\t./corpora/" + str(args.corpus_id) + "_" + merger.pop + "_cum_mafs.pdf")
     
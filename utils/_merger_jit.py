@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+#//////////////////////////////////////////////////////////////////////////#
+#                                                                          #
+#   Copyright (C) 2019 by David B. Blumenthal                              #
+#                                                                          #
+#   This file is part of EpiGEN.                                           #
+#                                                                          #
+#   EpiGEN is free software: you can redistribute it and/or modify         #
+#   it under the terms of the GNU General Public License as published by   #
+#   the Free Software Foundation, either version 3 of the License, or      #
+#   (at your option) any later version.                                    #
+#                                                                          #
+#   EpiGEN is distributed in the hope that it will be useful,              #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of         #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the           #
+#   GNU General Public License for more details.                           #
+#                                                                          #
+#   You should have received a copy of the GNU General Public License      #
+#   along with EpiGEN. If not, see <http://www.gnu.org/licenses/>.         #
+#                                                                          #
+#//////////////////////////////////////////////////////////////////////////#
+
+"""Contains the numba kernels used by utils.merger_kernels.
+
+Importing this module requires numba. Do not import it directly, use utils.merger_kernels.sum_along_inds() instead.
+"""
+
+import numba
+import numpy as np
+from .merger_kernels import swar_popcount, LOW_BITS, HIGH_BITS
+
+_swar_popcount_jit = numba.njit(cache=True)(swar_popcount)
+
+@numba.njit(parallel=True, cache=True)
+def sum_along_inds(packed):
+    """Computes the row sums of a genotype packed by pack_genotype_words() in parallel over the SNPs."""
+    sums = np.zeros(packed.shape[0], dtype=np.int64)
+    for snp in numba.prange(packed.shape[0]):
+        total = 0
+        for word in packed[snp]:
+            total += np.int64(_swar_popcount_jit(word & LOW_BITS)) + 2 * np.int64(_swar_popcount_jit(word & HIGH_BITS))
+        sums[snp] = total
+    return sums
@@ -27,16 +27,17 @@ from builtins import isinstance
 import argparse
 import collections.abc as abc
 
-def check_length(argname):
-    """Ensures that at least two arguments are provided.
+def check_length(argname, min_length=2):
+    """Ensures that at least min_length arguments are provided.
     
     Args:
         argname (str): Name of the argparse argument.
+        min_length (int): Minimal number of arguments.
     """
     class CheckLength(argparse.Action):
         def __call__(self, parser, args, values, option_string=None):
-            if not 2<=len(values):
-                msg="The argument \"{f}\" requires at least 2 arguments.".format(f=argname)
+            if not min_length<=len(values):
+                msg="The argument \"{f}\" requires at least {n} arguments.".format(f=argname, n=min_length)
                 raise argparse.ArgumentTypeError(msg)
             setattr(args, self.dest, values)
     return CheckLength
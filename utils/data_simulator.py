@@ -25,6 +25,7 @@
 import numpy as np
 import json
 import bz2
+import zstandard
 import os.path
 from .extensional_model import ExtensionalModel
 from .parametrized_model import ParametrizedModel
@@ -97,9 +98,13 @@ class DataSimulator(object):
         elif os.path.exists("corpora/" + str(corpus_id) + "_" + pop + "_genotype.json.bz2"):
             with bz2.open("corpora/" + str(corpus_id) + "_" + pop + "_genotype.json.bz2", "rt", encoding="ascii") as zipfile:
                 self.corpus_genotype = np.asarray(json.load(zipfile), dtype=np.uint8)
+        elif os.path.exists("corpora/" + str(corpus_id) + "_" + pop + "_genotype.json.zst"):
+            with zstandard.open("corpora/" + str(corpus_id) + "_" + pop + "_genotype.json.zst", "rt", encoding="ascii") as zipfile:
+                self.corpus_genotype = np.asarray(json.load(zipfile), dtype=np.uint8)
         else:
-            msg = "Neither the file corpora/" + str(corpus_id) + "_" + pop + "_genotype.json.bz2 "
-            msg += "nor the file corpora/" + str(corpus_id) + "_" + pop + "_genotype.json exists. "
+            msg = "None of the files corpora/" + str(corpus_id) + "_" + pop + "_genotype.json.zst, "
+            msg += "corpora/" + str(corpus_id) + "_" + pop + "_genotype.json.bz2, "
+            msg += "and corpora/" + str(corpus_id) + "_" + pop + "_genotype.json exists. "
             msg += "Change corpus or population ID or re-run generate_genotype_corpus.py." 
             raise OSError(msg)
         self.genotype = None
@@ -115,9 +120,13 @@ class DataSimulator(object):
         elif os.path.exists("corpora/" + str(corpus_id) + "_" + pop + "_snps.json.bz2"):
             with bz2.open("corpora/" + str(corpus_id) + "_" + pop + "_snps.json.bz2", "rt", encoding="ascii") as zipfile:
                 self.corpus_snps = json.load(zipfile)
+        elif os.path.exists("corpora/" + str(corpus_id) + "_" + pop + "_snps.json.zst"):
+            with zstandard.open("corpora/" + str(corpus_id) + "_" + pop + "_snps.json.zst", "rt", encoding="ascii") as zipfile:
+                self.corpus_snps = json.load(zipfile)
         else:
-            msg = "Neither the file corpora/" + str(corpus_id) + "_" + pop + "_snps.json.bz2 "
-            msg += "nor the file corpora/" + str(corpus_id) + "_" + pop + "_snps.json exists. "
+            msg = "None of the files corpora/" + str(corpus_id) + "_" + pop + "_snps.json.zst, "
+            msg += "corpora/" + str(corpus_id) + "_" + pop + "_snps.json.bz2, "
+            msg += "and corpora/" + str(corpus_id) + "_" + pop + "_snps.json exists. "
             msg += "Change corpus or population ID or re-run generate_genotype_corpus.py." 
             raise OSError(msg)
         self.snps = None
@@ -130,9 +139,13 @@ class DataSimulator(object):
         elif os.path.exists("corpora/" + str(corpus_id) + "_" + pop + "_mafs.json.bz2"):
             with bz2.open("corpora/" + str(corpus_id) + "_" + pop + "_mafs.json.bz2", "rt", encoding="ascii") as zipfile:
                 self.corpus_mafs = np.asarray(json.load(zipfile), dtype=float)
+        elif os.path.exists("corpora/" + str(corpus_id) + "_" + pop + "_mafs.json.zst"):
+            with zstandard.open("corpora/" + str(corpus_id) + "_" + pop + "_mafs.json.zst", "rt", encoding="ascii") as zipfile:
+                self.corpus_mafs = np.asarray(json.load(zipfile), dtype=float)
         else:
-            msg = "Neither the file corpora/" + str(corpus_id) + "_" + pop + "_mafs.json.bz2 "
-            msg += "nor the file corpora/" + str(corpus_id) + "_" + pop + "_mafs.json exists. "
+            msg = "None of the files corpora/" + str(corpus_id) + "_" + pop + "_mafs.json.zst, "
+            msg += "corpora/" + str(corpus_id) + "_" + pop + "_mafs.json.bz2, "
+            msg += "and corpora/" + str(corpus_id) + "_" + pop + "_mafs.json exists. "
             msg += "Change corpus or population ID or re-run generate_genotype_corpus.py." 
             raise OSError(msg)
         self.mafs = None
@@ -145,9 +158,13 @@ class DataSimulator(object):
         elif os.path.exists("corpora/" + str(corpus_id) + "_" + pop + "_cum_mafs.json.bz2"):
             with bz2.open("corpora/" + str(corpus_id) + "_" + pop + "_cum_mafs.json.bz2", "rt", encoding="ascii") as zipfile:
                 self.corpus_cum_mafs = json.load(zipfile)
+        elif os.path.exists("corpora/" + str(corpus_id) + "_" + pop + "_cum_mafs.json.zst"):
+            with zstandard.open("corpora/" + str(corpus_id) + "_" + pop + "_cum_mafs.json.zst", "rt", encoding="ascii") as zipfile:
+                self.corpus_cum_mafs = json.load(zipfile)
         else:
-            msg = "Neither the file corpora/" + str(corpus_id) + "_" + pop + "_cum_mafs.json.bz2 "
-            msg += "nor the file corpora/" + str(corpus_id) + "_" + pop + "_cum_mafs.json exists. "
+            msg = "None of the files corpora/" + str(corpus_id) + "_" + pop + "_cum_mafs.json.zst, "
+            msg += "corpora/" + str(corpus_id) + "_" + pop + "_cum_mafs.json.bz2, "
+            msg += "and corpora/" + str(corpus_id) + "_" + pop + "_cum_mafs.json exists. "
             msg += "Change corpus or population ID or re-run generate_genotype_corpus.py." 
             raise OSError(msg)
         self.cum_mafs = None
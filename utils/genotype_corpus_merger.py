@@ -23,11 +23,314 @@
 
 """Contains definition of GenotypeCorpusMerger class."""
 
+import os
 import os.path
+import importlib
 import numpy as np
 import json
 import bz2
-import matplotlib.pyplot as plt
+import shutil
+import zstandard
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from .merger_kernels import pack_genotype_words, unpack_genotype, sum_along_inds, count_alleles
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+JSON_SUFFIXES = {"none" : "json", "bz2" : "json.bz2", "zstd" : "json.zst"}
+"""dict of (str,str): Maps the codecs that can be used for the merged corpus to the suffixes of the JSON files."""
+
+FORMATS = ["json", "bin", "npy"]
+"""list of str: The formats that can be used for the genotype of the merged corpus."""
+
+OUTPUT_NAMES = ["genotype." + suffix for suffix in JSON_SUFFIXES.values()] + ["genotype.bin", "genotype_shape.json", "genotype.npy"]
+OUTPUT_NAMES += [name + "." + suffix for name in ["snps", "mafs", "cum_mafs"] for suffix in JSON_SUFFIXES.values()] + ["snps.npz", "mafs.npz"]
+"""list of str: The names of all files a merged corpus can consist of, except for the plot of the cumulative MAF distribution."""
+
+DEVICES = ["cpu", "cuda"]
+"""list of str: The devices the allele counts of the merged corpus can be computed on."""
+
+SNP_FIELDS = ["rs", "chrom", "pos", "maj", "min"]
+"""list of str: The fields of the structured numpy.arrays that contain the SNPs of the merged corpus."""
+
+def _snps_to_records(snps):
+    """Converts SNPs given as lists of the form [RS, "chr<CHROM>", POS, MAJOR, MINOR] into a structured numpy.array.
+    
+    The strings are converted in one pass to a 2D numpy.array, whose columns are then converted to the fields of the records.
+    
+    Args:
+        snps (list of (list of str)): A list with information about each SNP of a corpus.
+        
+    Returns:
+        numpy.array: A structured numpy.array with fields rs, chrom (int8), pos (int32), maj, and min.
+    """
+    table = np.array(snps, dtype=str).reshape(-1, len(SNP_FIELDS))
+    
+    # The string fields are only as long as the longest string they contain.
+    columns = [table[:, 0], np.char.lstrip(table[:, 1], "chr").astype(np.int8), table[:, 2].astype(np.int32), table[:, 3], table[:, 4]]
+    columns = [column.astype("U" + str(max(1, int(np.max(np.char.str_len(column), initial=0))))) if column.dtype.kind == "U" else column for column in columns]
+    records = np.empty(len(table), dtype=[(name, column.dtype) for name, column in zip(SNP_FIELDS, columns)])
+    for name, column in zip(SNP_FIELDS, columns):
+        records[name] = column
+    return records
+
+def _records_to_snps(records):
+    """Converts SNPs given as a structured numpy.array into lists of the form [RS, "chr<CHROM>", POS, MAJOR, MINOR].
+    
+    Args:
+        records (numpy.array): A structured numpy.array as returned by _snps_to_records().
+        
+    Returns:
+        list of (list of str): A list with information about each SNP.
+    """
+    return [[rs, "chr" + str(chrom), str(pos), maj, min_] for rs, chrom, pos, maj, min_ in records.tolist()]
+
+def _concatenate_snps(records):
+    """Concatenates structured numpy.arrays of SNPs whose string fields may have different lengths.
+    
+    Args:
+        records (list of numpy.array): A list of structured numpy.arrays as returned by _snps_to_records().
+        
+    Returns:
+        numpy.array: A structured numpy.array that contains all SNPs.
+    """
+    dtype = [(name, np.result_type(*[part.dtype[name] for part in records])) for name in SNP_FIELDS]
+    return np.concatenate([part.astype(dtype) for part in records])
+
+def _open_json(corpus_id, pop, name):
+    """Opens a (compressed) JSON file of a pre-computed corpus for reading.
+    
+    Args:
+        corpus_id (int): An integer that represents the ID of the corpus.
+        pop (str): A string representing the HAPMAP3 population code of the corpus.
+        name (str): The name of the file, e.g., "genotype" or "snps".
+        
+    Returns:
+        A binary stream with the decompressed content of the file ./corpora/<corpus_id>_<pop>_<name>.<suffix>.
+    """
+    prefix = "corpora/" + str(corpus_id) + "_" + pop + "_" + name
+    if os.path.exists(prefix + ".json"):
+        return open(prefix + ".json", "rb")
+    elif os.path.exists(prefix + ".json.bz2"):
+        return bz2.open(prefix + ".json.bz2", "rb")
+    elif os.path.exists(prefix + ".json.zst"):
+        return zstandard.open(prefix + ".json.zst", "rb")
+    else:
+        msg = "None of the files " + prefix + ".json.zst, " + prefix + ".json.bz2, "
+        msg += "and " + prefix + ".json exists. "
+        msg += "Change corpus or population ID or re-run generate_genotype_corpus.py." 
+        raise OSError(msg)
+
+def _read_json(corpus_id, pop, name):
+    """Reads the raw content of a (compressed) JSON file of a pre-computed corpus.
+    
+    Args:
+        corpus_id (int): An integer that represents the ID of the corpus.
+        pop (str): A string representing the HAPMAP3 population code of the corpus.
+        name (str): The name of the file, e.g., "genotype" or "snps".
+        
+    Returns:
+        bytes: The decompressed content of the file ./corpora/<corpus_id>_<pop>_<name>.<suffix>.
+    """
+    with _open_json(corpus_id, pop, name) as infile:
+        return infile.read()
+
+def _load_json(corpus_id, pop, name):
+    """Loads a (compressed) JSON file of a pre-computed corpus.
+    
+    Uses simdjson if it is installed and falls back to the json module otherwise.
+    
+    Args:
+        corpus_id (int): An integer that represents the ID of the corpus.
+        pop (str): A string representing the HAPMAP3 population code of the corpus.
+        name (str): The name of the file, e.g., "genotype" or "snps".
+        
+    Returns:
+        The de-serialized content of the file ./corpora/<corpus_id>_<pop>_<name>.<suffix>.
+    """
+    data = _read_json(corpus_id, pop, name)
+    if simdjson is None:
+        return json.loads(data)
+    return simdjson.Parser().parse(data).as_list()
+
+def _load_genotype(corpus_id, pop):
+    """Loads the genotype of a pre-computed corpus.
+    
+    NPY genotypes are memory-mapped read-only, such that copying them into the merged genotype is paged in by the OS.
+    If simdjson is installed, JSON genotypes are converted to a numpy.array directly from the parsed document,
+    without creating intermediate Python lists.
+    
+    Args:
+        corpus_id (int): An integer that represents the ID of the corpus.
+        pop (str): A string representing the HAPMAP3 population code of the corpus.
+        
+    Returns:
+        numpy.array: A numpy.array with entries from range(3). The rows represent SNPs, the columns represent individuals.
+    """
+    prefix = "corpora/" + str(corpus_id) + "_" + pop + "_genotype"
+    if os.path.exists(prefix + ".npy"):
+        return np.load(prefix + ".npy", mmap_mode="r").astype(np.uint8, copy=False)
+    elif os.path.exists(prefix + ".bin"):
+        with open(prefix + "_shape.json", "rt") as jsonfile:
+            shape = json.load(jsonfile)
+        packed = np.fromfile(prefix + ".bin", dtype=np.uint8).reshape(shape["num_snps"], -1)
+        return unpack_genotype(packed, shape["num_inds"])
+    data = _read_json(corpus_id, pop, "genotype")
+    if simdjson is None:
+        return np.asarray(json.loads(data), dtype=np.uint8)
+    doc = simdjson.Parser().parse(data)
+    num_snps = len(doc)
+    num_inds = len(doc[0]) if num_snps > 0 else 0
+    
+    # The buffer flattens all rows, so the length of every row has to be checked before it is reshaped.
+    if any(len(row) != num_inds for row in doc):
+        raise ValueError("The file " + prefix + " does not contain the same number of individuals for all SNPs.")
+    genotype = np.frombuffer(doc.as_buffer(of_type="u"), dtype=np.uint64)
+    return genotype.astype(np.uint8).reshape(num_snps, num_inds)
+
+def _load_snps(corpus_id, pop):
+    """Loads the SNPs of a pre-computed corpus.
+    
+    Args:
+        corpus_id (int): An integer that represents the ID of the corpus.
+        pop (str): A string representing the HAPMAP3 population code of the corpus.
+        
+    Returns:
+        numpy.array: A structured numpy.array with fields rs, chrom, pos, maj, and min and one record for each SNP of the corpus.
+    """
+    filename = "corpora/" + str(corpus_id) + "_" + pop + "_snps.npz"
+    if os.path.exists(filename):
+        with np.load(filename) as npzfile:
+            snps = npzfile["snps"]
+        if snps.dtype.names is not None:
+            return snps
+        return _snps_to_records(snps)
+    return _snps_to_records(_load_json(corpus_id, pop, "snps"))
+
+def _genotype_shape(corpus_id, pop, num_snps):
+    """Determines the shape of the genotype of a pre-computed corpus without loading it.
+    
+    Args:
+        corpus_id (int): An integer that represents the ID of the corpus.
+        pop (str): A string representing the HAPMAP3 population code of the corpus.
+        num_snps (int): The number of SNPs of the corpus, i.e., the size of its SNPs file.
+        
+    Returns:
+        (int,int): The number of SNPs and the number of individuals of the corpus.
+    """
+    prefix = "corpora/" + str(corpus_id) + "_" + pop + "_genotype"
+    if os.path.exists(prefix + ".npy") or os.path.exists(prefix + ".bin"):
+        if os.path.exists(prefix + ".npy"):
+            shape = np.shape(np.load(prefix + ".npy", mmap_mode="r"))
+        else:
+            with open(prefix + "_shape.json", "rt") as jsonfile:
+                shape = json.load(jsonfile)
+            shape = (shape["num_snps"], shape["num_inds"])
+        
+        # NPY and binary genotypes store their own shape, so it has to be checked against the SNPs.
+        if len(shape) != 2 or shape[0] != num_snps:
+            raise ValueError("The genotype " + prefix + " does not match the SNPs of corpus " + str(corpus_id) + "_" + pop + ".")
+        return tuple(shape)
+    if num_snps == 0:
+        return 0, 0
+    
+    # The genotype of the first SNP ends with the first closing bracket, so only the beginning of the file has to be read.
+    head = b""
+    with _open_json(corpus_id, pop, "genotype") as infile:
+        while b"]" not in head:
+            chunk = infile.read(65536)
+            if not chunk:
+                raise ValueError("The file " + prefix + " is not a valid genotype.")
+            head += chunk
+    first_row = head[head.index(b"[", head.index(b"[") + 1) + 1:head.index(b"]")]
+    if first_row.strip() == b"":
+        return num_snps, 0
+    return num_snps, first_row.count(b",") + 1
+
+def _read_genotype_into(corpus_id, pop, out, stream=False):
+    """Reads the genotype of a pre-computed corpus into a block of the merged genotype.
+    
+    If stream is True and ijson is installed, JSON genotypes are streamed SNP by SNP, such that only the genotype 
+    of one SNP of the corpus is held in memory at a time. Since simdjson parses much faster than ijson, streaming 
+    is otherwise only used if simdjson is not installed.
+    
+    Args:
+        corpus_id (int): An integer that represents the ID of the corpus.
+        pop (str): A string representing the HAPMAP3 population code of the corpus.
+        out (numpy.array): The block of the merged genotype the genotype of the corpus should be written to.
+        stream (bool): Whether JSON genotypes should be streamed. Parsing the complete JSON genotype requires many times more memory than out.
+    """
+    prefix = "corpora/" + str(corpus_id) + "_" + pop + "_genotype"
+    msg = "The genotype " + prefix + " does not match the SNPs of corpus " + str(corpus_id) + "_" + pop + "."
+    if ijson is None or (simdjson is not None and not stream) or os.path.exists(prefix + ".npy") or os.path.exists(prefix + ".bin"):
+        genotype = _load_genotype(corpus_id, pop)
+        if np.shape(genotype) != np.shape(out):
+            raise ValueError(msg)
+        out[:, :] = genotype
+        return
+    num_rows = 0
+    with _open_json(corpus_id, pop, "genotype") as infile:
+        for row in ijson.items(infile, "item"):
+            if num_rows >= np.shape(out)[0] or len(row) != np.shape(out)[1]:
+                raise ValueError(msg)
+            out[num_rows, :] = row
+            num_rows += 1
+    if num_rows != np.shape(out)[0]:
+        raise ValueError(msg)
+
+def _read_genotype_block(corpus_id, pop, shm_name, shape, axis, start, stop):
+    """Reads the genotype of a pre-computed corpus into a block of a merged genotype that resides in shared memory.
+    
+    Executed by the worker processes spawned by GenotypeCorpusMerger.merge_corpora(). JSON genotypes are streamed if ijson is installed.
+    
+    Args:
+        corpus_id (int): An integer that represents the ID of the corpus.
+        pop (str): A string representing the HAPMAP3 population code of the corpus.
+        shm_name (str): The name of the shared memory block that contains the merged genotype.
+        shape (tuple of int): The shape of the merged genotype.
+        axis (int): An integer representing the axis of the merge (0 for merge along SNPs, 1 for merge along individuals).
+        start (int): The first row (axis 0) or column (axis 1) of the block of the corpus.
+        stop (int): The row (axis 0) or column (axis 1) after the last one of the block of the corpus.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    genotype = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+    if axis == 0:
+        _read_genotype_into(corpus_id, pop, genotype[start:stop, :], True)
+    else:
+        _read_genotype_into(corpus_id, pop, genotype[:, start:stop], True)
+    del genotype
+    shm.close()
+
+def _plot_cum_mafs(cum_mafs, filename, max_points=4096):
+    """Plots a cumulative MAF distribution.
+    
+    Matplotlib is only imported here and the figure is rendered with its object-oriented API, without pyplot's global state.
+    Since the distribution is monotone, it is plotted at no more than max_points evenly spaced positions.
+    
+    Args:
+        cum_mafs (list of (float,int)): A list of pairs of the form (MAF,count) representing the cumulative MAF distribution.
+        filename (str): The file the plot should be saved to.
+        max_points (int): The maximal number of plotted points.
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    cum_mafs = np.asarray(cum_mafs, dtype=float).reshape(-1, 2)
+    if len(cum_mafs) > max_points:
+        cum_mafs = cum_mafs[np.unique(np.linspace(0, len(cum_mafs) - 1, max_points).astype(int))]
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    ax.set_xlim(0,1)
+    ax.plot(cum_mafs[:, 0], cum_mafs[:, 1])
+    ax.set(xlabel="MAF", ylabel="# SNPs with MAF(SNP) <= MAF", title="Cumulative MAF Distribution")
+    ax.grid()
+    fig.savefig(filename)
 
 class GenotypeCorpusMerger(object):
     """Merges pre-computed genotype corpora.
@@ -43,18 +346,22 @@ class GenotypeCorpusMerger(object):
         pop (str): A string representing the HAPMAP3 population code of the merged corpus.
         genotype (numpy.array): A numpy.array with entries from range(3) that contains the merged genotypes. 
             The rows represent SNPs, the columns represent individuals.
-        snps (list of (list of str)): A list with one entry for each row of self.genotype. The entries provide information 
-            about the corresponding SNP.
+        snps (numpy.array): A structured numpy.array with one record for each row of self.genotype. The fields rs, chrom, pos, maj, 
+            and min provide information about the corresponding SNP.
         mafs (numpy.array): A numpy.array of floats representing the MAFs of all rows of self.genotype.
         cum_mafs (list of (float,int)): A list of pairs of the form (MAF,count) representing the cumulative MAF distribution.
         axis (int): An integer representing the axis of the merge (0 for merge along SNPs, 1 for merge along individuals). 
         num_snps (int): Number of SNPs in merged corpus.
         num_inds (int): Number of individuals in merged corpus.
-        compress (bool): If True, the merged corpus is compressed. 
+        codec (str): The codec used to compress the merged corpus. Either "none", "bz2", or "zstd".
+        suffix (str): The suffix of the JSON files of the merged corpus.
+        genotype_format (str): The format of the genotype of the merged corpus. Either "json", "bin" (2 bits per genotype), or "npy".
+            If "npy", SNPs and MAFs are dumped to compressed .npz files.
+        device (str): The device the allele counts of the merged corpus are computed on. Either "cpu" or "cuda".
      """
 
 
-    def __init__(self, corpus_ids, pops, corpus_id, axis, compress):
+    def __init__(self, corpus_ids, pops, corpus_id, axis, codec, genotype_format="json", device="cpu"):
         """Initializes GenotypeCorpusGenerator.
         
         Args:
@@ -62,12 +369,16 @@ class GenotypeCorpusMerger(object):
             pop (str): A list of strings representing the HAPMAP3 population codes of the corpora that should be merged.
             corpus_id (int): An integer that represents the ID of the generated corpus. 
             axis (int): An integer representing the axis of the merge (0 for merge along SNPs, 1 for merge along individuals)
-            compress (bool): If True, the merged corpus is compressed.
+            codec (str): The codec used to compress the merged corpus. Either "none", "bz2", or "zstd".
+            genotype_format (str): The format of the genotype of the merged corpus. Either "json", "bin", or "npy".
+            device (str): The device the allele counts of the merged corpus are computed on. Either "cpu" or "cuda".
         """
         
         # Print information.
         print("Initializing the merger ... ")
         
+        if len(corpus_ids) != len(pops):
+            raise ValueError("Got {} corpus IDs but {} population codes. Expected one population code for each corpus.".format(len(corpus_ids), len(pops)))
         self.corpus_ids = corpus_ids
         self.pops = pops
         self.pop = "MIX"
@@ -75,151 +386,365 @@ class GenotypeCorpusMerger(object):
             self.pop = self.pops[0]
         self.corpus_id = corpus_id
         self.genotype = None
-        self.snps = []
+        self._packed = None
+        self._shm = None
+        self.snps = _snps_to_records([])
         self.mafs = None
         self.cum_mafs = []
         self.axis = axis
         self.num_snps = 0
         self.num_inds = 0
-        self.compress = compress
+        if codec not in JSON_SUFFIXES:
+            raise ValueError("Unsupported codec {}. Expected one of {}.".format(codec, ", ".join(JSON_SUFFIXES)))
+        self.codec = codec
+        self.suffix = JSON_SUFFIXES[codec]
+        if genotype_format not in FORMATS:
+            raise ValueError("Unsupported format {}. Expected one of {}.".format(genotype_format, ", ".join(FORMATS)))
+        self.genotype_format = genotype_format
+        if device not in DEVICES:
+            raise ValueError("Unsupported device {}. Expected one of {}.".format(device, ", ".join(DEVICES)))
+        if device == "cuda":
+            
+            # Fail before any corpus is read or written if CuPy is not available.
+            try:
+                importlib.import_module("cupy")
+            except ImportError:
+                raise ImportError("Computing allele counts on a CUDA device requires CuPy.")
+        self.device = device
         
     
+    def _open_output(self, name, partial=False):
+        """Opens a JSON file of the merged corpus for writing, using the selected codec.
+        
+        Args:
+            name (str): The name of the file, e.g., "genotype" or "snps".
+            partial (bool): If True, the file is opened under the temporary name ./corpora/<corpus_id>_<pop>_<name>.<suffix>.part.
+            
+        Returns:
+            A text stream for the file ./corpora/<corpus_id>_<pop>_<name>.<suffix>.
+        """
+        filename = "corpora/" + str(self.corpus_id) + "_" + self.pop + "_" + name + "." + self.suffix
+        if partial:
+            filename += ".part"
+        if self.codec == "zstd":
+            return zstandard.open(filename, "wt", cctx=zstandard.ZstdCompressor(level=7, threads=-1), encoding="ascii")
+        elif self.codec == "bz2":
+            return bz2.open(filename, "wt", encoding="ascii")
+        return open(filename, "wt", encoding="ascii")
+    
+    def _load_snps_and_shapes(self):
+        """Loads the SNPs of all corpora and determines the shapes of their genotypes.
+        
+        The SNPs of the merged corpus are the SNPs of all corpora if SNPs are appended and the SNPs of the first corpus otherwise.
+        
+        Returns:
+            list of (int,int): The number of SNPs and the number of individuals of each corpus.
+        """
+        shapes = []
+        snps = []
+        for pos, (corpus_id, pop) in enumerate(zip(self.corpus_ids, self.pops)):
+            records = _load_snps(corpus_id, pop)
+            shapes.append(_genotype_shape(corpus_id, pop, len(records)))
+            if pos == 0 or self.axis == 0:
+                snps.append(records)
+        self.snps = _concatenate_snps(snps)
+        if len(set(shape[1 - self.axis] for shape in shapes)) > 1:
+            raise ValueError("Wrong array dimensions. Cannot merge along axis {}.".format(self.axis))
+        return shapes
+    
+    def _output_names(self):
+        """Determines the names of the files of the merged corpus, except for the plot of the cumulative MAF distribution.
+        
+        Returns:
+            list of str: The names of the files, e.g., "genotype.json.zst". The files are located at ./corpora/<corpus_id>_<pop>_<name>.
+        """
+        names = []
+        if self.genotype_format == "bin":
+            names += ["genotype.bin", "genotype_shape.json"]
+        elif self.genotype_format == "npy":
+            names += ["genotype.npy", "snps.npz", "mafs.npz"]
+        else:
+            names += ["genotype." + self.suffix]
+        if self.genotype_format != "npy":
+            names += ["snps." + self.suffix, "mafs." + self.suffix]
+        names += ["cum_mafs." + self.suffix]
+        return names
+    
+    def _remove_other_variants(self):
+        """Removes files of the merged corpus that have another codec or format than the generated files.
+        
+        The loaders of this script and of simulate_data.py try the formats and codecs in a fixed order, 
+        so leftover files of an earlier corpus with the same ID would otherwise shadow the generated files.
+        """
+        prefix = "corpora/" + str(self.corpus_id) + "_" + self.pop + "_"
+        names = self._output_names()
+        for name in OUTPUT_NAMES:
+            if name not in names and os.path.exists(prefix + name):
+                os.remove(prefix + name)
+    
+    def copy_corpus(self):
+        """Copies a single corpus to the merged corpus without merging.
+        
+        Only possible if the files of the corpus already have the format and the codec of the merged corpus.
+        The plot of the cumulative MAF distribution is regenerated if it does not exist.
+        
+        Returns:
+            bool: True if the corpus has been copied and False if it has to be merged.
+        """
+        if len(self.corpus_ids) != 1:
+            return False
+        
+        # Determine the files of the corpus.
+        names = self._output_names()
+        source_prefix = "corpora/" + str(self.corpus_ids[0]) + "_" + self.pop + "_"
+        if not all(os.path.exists(source_prefix + name) for name in names):
+            return False
+        
+        # Print information.
+        print("Copying genotype corpus ...")
+        
+        # Copy the files. Hard links are not used, since they would make later dumps to the copy overwrite the original.
+        target_prefix = "corpora/" + str(self.corpus_id) + "_" + self.pop + "_"
+        if source_prefix != target_prefix:
+            for name in names:
+                shutil.copyfile(source_prefix + name, target_prefix + name)
+            if os.path.exists(source_prefix + "cum_mafs.pdf"):
+                shutil.copyfile(source_prefix + "cum_mafs.pdf", target_prefix + "cum_mafs.pdf")
+        self._remove_other_variants()
+        
+        # The number of SNPs whose MAF does not exceed the largest MAF is the number of SNPs of the corpus.
+        self.cum_mafs = _load_json(self.corpus_id, self.pop, "cum_mafs")
+        self.num_snps = float(self.cum_mafs[-1][1]) if len(self.cum_mafs) > 0 else 0.0
+        if not os.path.exists(target_prefix + "cum_mafs.pdf"):
+            _plot_cum_mafs(self.cum_mafs, target_prefix + "cum_mafs.pdf")
+        return True
+    
     def merge_corpora(self):
+        """Merges the genotypes and SNPs of all corpora."""
+        
+        # Print information.
         print("Merging genotype corpora ...")
         
-        # Load the first genotype corpus.
-        corpus_id = self.corpus_ids[0]
-        pop = self.pops[0]
-        if os.path.exists("corpora/" + str(corpus_id) + "_" + pop + "_genotype.json"):
-            with open("corpora/" + str(corpus_id) + "_" + pop + "_genotype.json", "rt") as jsonfile:
-                self.genotype = np.asarray(json.load(jsonfile), dtype=np.uint8)
-        elif os.path.exists("corpora/" + str(corpus_id) + "_" + pop + "_genotype.json.bz2"):
-            with bz2.open("corpora/" + str(corpus_id) + "_" + pop + "_genotype.json.bz2", "rt", encoding="ascii") as zipfile:
-                self.genotype = np.asarray(json.load(zipfile), dtype=np.uint8)
-        else:
-            msg = "Neither the file corpora/" + str(corpus_id) + "_" + pop + "_genotype.json.bz2 "
-            msg += "nor the file corpora/" + str(corpus_id) + "_" + pop + "_genotype.json exists. "
-            msg += "Change corpus or population ID or re-run generate_genotype_corpus.py." 
-            raise OSError(msg)
-        
-        # Load SNPs.
-        if os.path.exists("corpora/" + str(corpus_id) + "_" + pop + "_snps.json"):
-            with open("corpora/" + str(corpus_id) + "_" + pop + "_snps.json", "rt") as jsonfile:
-                self.snps = json.load(jsonfile)
-        elif os.path.exists("corpora/" + str(corpus_id) + "_" + pop + "_snps.json.bz2"):
-            with bz2.open("corpora/" + str(corpus_id) + "_" + pop + "_snps.json.bz2", "rt", encoding="ascii") as zipfile:
-                self.snps = json.load(zipfile)
+        # Load the SNPs of all corpora and determine the shapes of their genotypes.
+        shapes = self._load_snps_and_shapes()
+        
+        # Determine the blocks of the merged genotype that contain the individual corpora.
+        shape = list(shapes[0])
+        shape[self.axis] = sum(shape[self.axis] for shape in shapes)
+        shape = tuple(shape)
+        offsets = np.cumsum([0] + [shape[self.axis] for shape in shapes]).tolist()
+        corpora = list(zip(self.corpus_ids, self.pops, offsets[:-1], offsets[1:]))
+        
+        # If all genotypes are NPY files, they are memory-mapped and copied block by block without any parsing. Parsing the corpora is 
+        # CPU-bound, so, otherwise and if several CPUs are available, the corpora are read by worker processes that write 
+        # their blocks of the merged genotype to shared memory. Otherwise, they are read one after another.
+        num_workers = min(len(corpora), os.cpu_count() or 1)
+        if all(os.path.exists("corpora/" + str(corpus_id) + "_" + pop + "_genotype.npy") for corpus_id, pop in zip(self.corpus_ids, self.pops)):
+            self.genotype = np.empty(shape, dtype=np.uint8)
+            for corpus_id, pop, start, stop in corpora:
+                genotype = np.load("corpora/" + str(corpus_id) + "_" + pop + "_genotype.npy", mmap_mode="r")
+                if self.axis == 0:
+                    np.copyto(self.genotype[start:stop, :], genotype, casting="unsafe")
+                else:
+                    np.copyto(self.genotype[:, start:stop], genotype, casting="unsafe")
+                del genotype
+        elif num_workers > 1:
+            
+            # The shared memory block remains the backing store of the merged genotype until the corpus has been dumped.
+            self._shm = shared_memory.SharedMemory(create=True, size=max(1, shape[0] * shape[1]))
+            try:
+                with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                    futures = [executor.submit(_read_genotype_block, corpus_id, pop, self._shm.name, shape, self.axis, start, stop) for corpus_id, pop, start, stop in corpora]
+                    for future in futures:
+                        future.result()
+            except BaseException:
+                self._release_shared_memory()
+                raise
+            self.genotype = np.ndarray(shape, dtype=np.uint8, buffer=self._shm.buf)
         else:
-            msg = "Neither the file corpora/" + str(corpus_id) + "_" + pop + "_snps.json.bz2 "
-            msg += "nor the file corpora/" + str(corpus_id) + "_" + pop + "_snps.json exists. "
-            msg += "Change corpus or population ID or re-run generate_genotype_corpus.py." 
-            raise OSError(msg)
-        
-        # Merge the corpora.
-        for pos in range(1, len(self.corpus_ids)):
-            corpus_id = self.corpus_ids[pos]
-            pop = self.pops[0]
-            if os.path.exists("corpora/" + str(corpus_id) + "_" + pop + "_genotype.json"):
-                with open("corpora/" + str(corpus_id) + "_" + pop + "_genotype.json", "rt") as jsonfile:
-                    try:
-                        self.genotype = np.append(self.genotype, np.asarray(json.load(jsonfile), dtype=np.uint8), axis=self.axis)
-                    except:
-                        raise ValueError("Wrong array dimensions. Cannot merge along axis {}.".format(self.axis))
-            elif os.path.exists("corpora/" + str(corpus_id) + "_" + pop + "_genotype.json.bz2"):
-                with bz2.open("corpora/" + str(corpus_id) + "_" + pop + "_genotype.json.bz2", "rt", encoding="ascii") as zipfile:
-                    try:
-                        self.genotype = np.append(self.genotype, np.asarray(json.load(zipfile), dtype=np.uint8), axis=self.axis)
-                    except:
-                        raise ValueError("Wrong array dimensions. Cannot merge along axis {}.".format(self.axis))
-            else:
-                msg = "Neither the file corpora/" + str(corpus_id) + "_" + pop + "_genotype.json.bz2 "
-                msg += "nor the file corpora/" + str(corpus_id) + "_" + pop + "_genotype.json exists. "
-                msg += "Change corpus or population ID or re-run generate_genotype_corpus.py." 
-                raise OSError(msg)
-            if self.axis == 0:
-                if os.path.exists("corpora/" + str(corpus_id) + "_" + pop + "_snps.json"):
-                    with open("corpora/" + str(corpus_id) + "_" + pop + "_snps.json", "rt") as jsonfile:
-                        self.snps += json.load(jsonfile)
-                elif os.path.exists("corpora/" + str(corpus_id) + "_" + pop + "_snps.json.bz2"):
-                    with bz2.open("corpora/" + str(corpus_id) + "_" + pop + "_snps.json.bz2", "rt", encoding="ascii") as zipfile:
-                        self.snps += json.load(zipfile)
+            self.genotype = np.empty(shape, dtype=np.uint8)
+            for corpus_id, pop, start, stop in corpora:
+                if self.axis == 0:
+                    _read_genotype_into(corpus_id, pop, self.genotype[start:stop, :], True)
                 else:
-                    msg = "Neither the file corpora/" + str(corpus_id) + "_" + pop + "_snps.json.bz2 "
-                    msg += "nor the file corpora/" + str(corpus_id) + "_" + pop + "_snps.json exists. "
-                    msg += "Change corpus or population ID or re-run generate_genotype_corpus.py." 
-                    raise OSError(msg)
+                    _read_genotype_into(corpus_id, pop, self.genotype[:, start:stop], True)
                 
         # Set number of SNPs and individuals.
         self.num_snps = float(np.shape(self.genotype)[0])
         self.num_inds = float(np.shape(self.genotype)[1])
         
+        # Pack the genotype with 2 bits per entry for the binary output.
+        if self.genotype_format == "bin":
+            self._packed = pack_genotype_words(self.genotype)
         
-    
-    def compute_mafs(self):
-        """Computes MAFs for all SNPs contained in self.genotype."""
+    def merge_and_dump_streaming(self):
+        """Merges the corpora along the SNPs and dumps the merged corpus without materializing the merged genotype.
+        
+        Since all corpora contain the same individuals, the genotype of each corpus can be appended to the output file 
+        right after it has been loaded, and the MAFs of its SNPs can be computed from it alone. Therefore, only the genotype of 
+        one corpus is held in memory at a time. Replaces the calls to merge_corpora(), summarize(), and dump_corpus().
+        """
+        if self.axis != 0:
+            raise ValueError("Streaming merge is only possible along axis 0.")
+        
+        # Print information.
+        print("Merging and serializing genotype corpora ...")
+        
+        # Load the SNPs of all corpora and determine the shapes of their genotypes.
+        shapes = self._load_snps_and_shapes()
+        self.num_snps = float(sum(shape[0] for shape in shapes))
+        self.num_inds = float(shapes[0][1])
+        num_snps = int(self.num_snps)
+        num_inds = int(self.num_inds)
+        
+        # Open the genotype output: a pre-sized memory-mapped NPY file, a binary file, or a JSON file that is written row by row.
+        # The output is written to a temporary file that only replaces the genotype file once all corpora have been read, 
+        # such that neither failures nor merged corpora that overwrite one of their inputs destroy existing files.
+        filename = "corpora/" + str(self.corpus_id) + "_" + self.pop + "_genotype."
+        if self.genotype_format == "json":
+            filename += self.suffix
+        else:
+            filename += self.genotype_format
+        if self.genotype_format == "npy":
+            outfile = np.lib.format.open_memmap(filename + ".part", mode="w+", dtype=np.uint8, shape=(num_snps, num_inds))
+        elif self.genotype_format == "bin":
+            outfile = open(filename + ".part", "wb")
+        else:
+            outfile = self._open_output("genotype", True)
+            outfile.write("[")
+        
+        # Append the corpora one after another and count the minor alleles at their SNPs.
+        allele_counts = np.empty(num_snps, dtype=np.int64)
+        start = 0
+        completed = False
+        try:
+            for corpus_id, pop, shape in zip(self.corpus_ids, self.pops, shapes):
+                genotype = np.empty(shape, dtype=np.uint8)
+                _read_genotype_into(corpus_id, pop, genotype, True)
+                if self.genotype_format == "bin":
+                    packed = pack_genotype_words(genotype)
+                    allele_counts[start:start + shape[0]] = sum_along_inds(packed, self.device)
+                    packed.view(np.uint8)[:, :(num_inds + 3) // 4].tofile(outfile)
+                    del packed
+                else:
+                    allele_counts[start:start + shape[0]] = count_alleles(genotype, self.device)
+                if self.genotype_format == "npy":
+                    outfile[start:start + shape[0], :] = genotype
+                elif self.genotype_format == "json":
+                    for row in range(0, shape[0], 1024):
+                        if start + row > 0:
+                            outfile.write(", ")
+                        outfile.write(json.dumps(genotype[row:row + 1024].tolist())[1:-1])
+                start += shape[0]
+                del genotype
+            if self.genotype_format == "json":
+                outfile.write("]")
+            completed = True
+        finally:
+            if self.genotype_format == "npy":
+                outfile.flush()
+                del outfile
+            else:
+                outfile.close()
+            if completed:
+                os.replace(filename + ".part", filename)
+            else:
+                os.remove(filename + ".part")
+        if self.genotype_format == "bin":
+            self._dump_genotype_shape()
+        
+        # Compute the MAFs and dump SNPs, MAFs, and the cumulative MAF distribution.
+        self._set_mafs(allele_counts)
+        self._dump_summary()
+        self._remove_other_variants()
+        
+    def summarize(self):
+        """Computes the MAFs and the cumulative MAF distribution of self.genotype.
+        
+        The genotype is traversed only once, in its packed form if it has been packed for the binary output. 
+        The cumulative MAF distribution is derived from the MAFs.
+        """
         
         # Print information.
         print("Computing MAFs ... ")
         
-        # Compute the minor allele frequencies.
-        self.mafs = np.apply_along_axis(np.sum, 1, np.sign(self.genotype)) / self.num_inds
+        # Compute the minor allele frequencies with one pass over the genotype.
+        if self._packed is not None:
+            self._set_mafs(sum_along_inds(self._packed, self.device))
+        else:
+            self._set_mafs(count_alleles(self.genotype, self.device))
         
-        # Compute cumulative MAF distribution.
-        self.cum_mafs = []
-        sorted_mafs = sorted(self.mafs.tolist())
-        current_maf = sorted_mafs[0]
-        counter = 1
-        for pos in range(1,len(sorted_mafs)):
-            if sorted_mafs[pos] != current_maf:
-                self.cum_mafs.append([current_maf, counter])
-                current_maf = sorted_mafs[pos]
-            counter += 1
-        self.cum_mafs.append([current_maf, counter])
+    def _set_mafs(self, allele_counts):
+        """Sets the MAFs and the cumulative MAF distribution.
+        
+        Args:
+            allele_counts (numpy.array): A numpy.array of integers representing the number of minor alleles at each SNP.
+        """
+        self.mafs = allele_counts / (self.num_inds * 2)
+        
+        # Compute cumulative MAF distribution. For each distinct MAF, the number of SNPs whose MAF does not exceed it
+        # is its right insertion position in the sorted MAFs.
+        sorted_mafs = np.sort(self.mafs)
+        distinct_mafs = np.unique(sorted_mafs)
+        counts = np.searchsorted(sorted_mafs, distinct_mafs, side="right")
+        self.cum_mafs = [[maf, count] for maf, count in zip(distinct_mafs.tolist(), counts.tolist())]
             
+    def _dump_genotype_shape(self):
+        """Dumps the JSON file with the shape of a binary genotype."""
+        with open("corpora/" + str(self.corpus_id) + "_" + self.pop + "_genotype_shape.json", "wt", encoding="ascii") as jsonfile:
+            json.dump({"num_snps" : int(self.num_snps), "num_inds" : int(self.num_inds), "dtype" : "uint8", "bits_per_genotype" : 2}, jsonfile)
         
+    def _release_shared_memory(self):
+        """Releases the shared memory block that backs self.genotype if the corpora have been read by worker processes."""
+        if self._shm is not None:
+            self.genotype = None
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
         
     def dump_corpus(self):
-        """Dumps the generated corpus to zipped JSON files."""
+        """Dumps the generated corpus to (compressed) JSON, binary, or NPY files.
+        
+        If self.genotype resides in shared memory, the shared memory is released afterwards and self.genotype is set to None.
+        """
         
         # Print information.
         print("Serializing the genotype corpus ... ")
         
-        # Dump genotype.
-        if self.compress:
-            with bz2.open("corpora/" + str(self.corpus_id) + "_" + self.pop + "_genotype.json.bz2", "wt", encoding="ascii") as zipfile:
-                json.dump(self.genotype.tolist(), zipfile)
-                
-            # Dump SNPs.
-            with bz2.open("corpora/" + str(self.corpus_id) + "_" + self.pop + "_snps.json.bz2", "wt", encoding="ascii") as zipfile:
-                json.dump(self.snps, zipfile)
-                
-            # Dump MAFs.
-            with bz2.open("corpora/" + str(self.corpus_id) + "_" + self.pop + "_mafs.json.bz2", "wt", encoding="ascii") as zipfile:
-                json.dump(self.mafs.tolist(), zipfile)
-                
-            # Dump cumulative MAF distribution.
-            with bz2.open("corpora/" + str(self.corpus_id) + "_" + self.pop + "_cum_mafs.json.bz2", "wt", encoding="ascii") as zipfile:
-                json.dump(self.cum_mafs, zipfile)
+        # Dump genotype, either in binary format, i.e., 4 genotypes per byte plus a JSON file with the shape, as NPY, or as JSON.
+        prefix = "corpora/" + str(self.corpus_id) + "_" + self.pop
+        if self.genotype_format == "bin":
+            self._packed.view(np.uint8)[:, :(int(self.num_inds) + 3) // 4].tofile(prefix + "_genotype.bin")
+            self._dump_genotype_shape()
+        elif self.genotype_format == "npy":
+            np.save(prefix + "_genotype.npy", self.genotype.astype(np.uint8, copy=False))
         else:
-            with open("corpora/" + str(self.corpus_id) + "_" + self.pop + "_genotype.json", "wt", encoding="ascii") as jsonfile:
-                json.dump(self.genotype.tolist(), jsonfile)
-                
-            # Dump SNPs.
-            with open("corpora/" + str(self.corpus_id) + "_" + self.pop + "_snps.json", "wt", encoding="ascii") as jsonfile:
-                json.dump(self.snps, jsonfile)
-                
-            # Dump MAFs.
-            with open("corpora/" + str(self.corpus_id) + "_" + self.pop + "_mafs.json", "wt", encoding="ascii") as jsonfile:
-                json.dump(self.mafs.tolist(), jsonfile)
-                
-            # Dump cumulative MAF distribution.
-            with open("corpora/" + str(self.corpus_id) + "_" + self.pop + "_cum_mafs.json", "wt", encoding="ascii") as jsonfile:
-                json.dump(self.cum_mafs, jsonfile)
+            with self._open_output("genotype") as outfile:
+                json.dump(self.genotype.tolist(), outfile)
+        
+        self._release_shared_memory()
+        
+        # Dump SNPs, MAFs, and the cumulative MAF distribution.
+        self._dump_summary()
+        self._remove_other_variants()
+        
+    def _dump_summary(self):
+        """Dumps SNPs, MAFs, and the cumulative MAF distribution of the merged corpus and plots the cumulative MAF distribution."""
+        
+        # Dump SNPs and MAFs.
+        prefix = "corpora/" + str(self.corpus_id) + "_" + self.pop
+        if self.genotype_format == "npy":
+            np.savez_compressed(prefix + "_snps.npz", snps=self.snps)
+            np.savez_compressed(prefix + "_mafs.npz", mafs=self.mafs)
+        else:
+            with self._open_output("snps") as outfile:
+                json.dump(_records_to_snps(self.snps), outfile)
+            with self._open_output("mafs") as outfile:
+                json.dump(self.mafs.tolist(), outfile)
+            
+        # Dump cumulative MAF distribution.
+        with self._open_output("cum_mafs") as outfile:
+            json.dump(self.cum_mafs, outfile)
         
         # Plot cumulative MAF distribution.
-        fig, ax = plt.subplots()
-        plt.xlim(0,1)
-        ax.plot(*zip(*self.cum_mafs))
-        ax.set(xlabel="MAF", ylabel="# SNPs with MAF(SNP) <= MAF", title="Cumulative MAF Distribution")
-        ax.grid()
-        fig.savefig("corpora/" + str(self.corpus_id) + "_" + self.pop + "_cum_mafs.pdf")
+        _plot_cum_mafs(self.cum_mafs, prefix + "_cum_mafs.pdf")
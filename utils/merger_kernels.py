@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+
+#//////////////////////////////////////////////////////////////////////////#
+#                                                                          #
+#   Copyright (C) 2019 by David B. Blumenthal                              #
+#                                                                          #
+#   This file is part of EpiGEN.                                           #
+#                                                                          #
+#   EpiGEN is free software: you can redistribute it and/or modify         #
+#   it under the terms of the GNU General Public License as published by   #
+#   the Free Software Foundation, either version 3 of the License, or      #
+#   (at your option) any later version.                                    #
+#                                                                          #
+#   EpiGEN is distributed in the hope that it will be useful,              #
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of         #
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the           #
+#   GNU General Public License for more details.                           #
+#                                                                          #
+#   You should have received a copy of the GNU General Public License      #
+#   along with EpiGEN. If not, see <http://www.gnu.org/licenses/>.         #
+#                                                                          #
+#//////////////////////////////////////////////////////////////////////////#
+
+"""Contains the numerical kernels used by the GenotypeCorpusMerger class.
+
+Most kernels operate on genotypes that are packed with 2 bits per entry. NumPy implementations are always available.
+The parallel numba implementations in utils._merger_jit are only imported for large genotypes. They are compiled
+with cache=True, such that the compiled machine code is stored next to the sources and later runs skip compilation.
+CuPy is only imported if the allele counts are requested on a CUDA device.
+"""
+
+import numpy as np
+
+def pack_genotype(genotype):
+    """Packs a genotype matrix into 2 bits per entry.
+    
+    Each row is padded with zeros to a multiple of 4 individuals and 4 consecutive genotypes 
+    g0, g1, g2, g3 are stored in one byte as (g0<<6)|(g1<<4)|(g2<<2)|g3. This is the layout used 
+    by PLINK .bed files and by SnpArrays.jl.
+    
+    Args:
+        genotype (numpy.array): A numpy.array with entries from range(4). The rows represent SNPs, the columns represent individuals.
+        
+    Returns:
+        numpy.array: A numpy.array of dtype uint8 with one row for each row of genotype and ceil(#individuals / 4) columns.
+    """
+    num_snps, num_inds = np.shape(genotype)
+    padded = np.zeros((num_snps, 4 * ((num_inds + 3) // 4)), dtype=np.uint8)
+    padded[:, :num_inds] = genotype
+    quads = padded.reshape(num_snps, -1, 4)
+    return (quads[:, :, 0] << 6) | (quads[:, :, 1] << 4) | (quads[:, :, 2] << 2) | quads[:, :, 3]
+
+def unpack_genotype(packed, num_inds):
+    """Unpacks a genotype matrix packed by pack_genotype().
+    
+    Args:
+        packed (numpy.array): A numpy.array of dtype uint8 as returned by pack_genotype().
+        num_inds (int): The number of individuals, i.e., the number of columns of the unpacked matrix.
+        
+    Returns:
+        numpy.array: A numpy.array of dtype uint8 with entries from range(4). The rows represent SNPs, the columns represent individuals.
+    """
+    quads = np.empty(np.shape(packed) + (4,), dtype=np.uint8)
+    quads[:, :, 0] = packed >> 6
+    quads[:, :, 1] = (packed >> 4) & 3
+    quads[:, :, 2] = (packed >> 2) & 3
+    quads[:, :, 3] = packed & 3
+    return quads.reshape(np.shape(packed)[0], -1)[:, :num_inds]
+
+def pack_genotype_words(genotype):
+    """Packs a genotype matrix into rows of 64-bit words with 2 bits per entry.
+    
+    Each row is padded with zeros to a multiple of 32 individuals and every uint64 holds the genotypes of 32 individuals 
+    in the layout of pack_genotype(). Viewed as uint8, the first ceil(#individuals / 4) bytes of each row coincide 
+    with the output of pack_genotype().
+    
+    Args:
+        genotype (numpy.array): A numpy.array with entries from range(4). The rows represent SNPs, the columns represent individuals.
+        
+    Returns:
+        numpy.array: A numpy.array of dtype uint64 with one row for each row of genotype and ceil(#individuals / 32) columns.
+    """
+    num_snps, num_inds = np.shape(genotype)
+    packed = np.zeros((num_snps, 8 * ((num_inds + 31) // 32)), dtype=np.uint8)
+    for start in range(0, num_snps, 4096):
+        packed[start:start + 4096, :(num_inds + 3) // 4] = pack_genotype(genotype[start:start + 4096])
+    return packed.view(np.uint64)
+
+JIT_MIN_WORDS = 1 << 24
+"""int: Minimal number of 64-bit words of a packed genotype for which sum_along_inds() uses numba."""
+
+LOW_BITS = np.uint64(0x5555555555555555)
+HIGH_BITS = np.uint64(0xAAAAAAAAAAAAAAAA)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+_S1 = np.uint64(1)
+_S2 = np.uint64(2)
+_S4 = np.uint64(4)
+_S56 = np.uint64(56)
+
+def swar_popcount(words):
+    """Counts the set bits of 64-bit words with the SWAR algorithm. Works for numpy.arrays and, compiled by numba, for scalars."""
+    words = words - ((words >> _S1) & LOW_BITS)
+    words = (words & _M2) + ((words >> _S2) & _M2)
+    words = (words + (words >> _S4)) & _M4
+    return (words * _H01) >> _S56
+
+_popcount = getattr(np, "bitwise_count", swar_popcount)
+
+def _sum_along_inds_numpy(packed):
+    """Computes the row sums of a genotype packed by pack_genotype_words() with vectorized popcounts."""
+    sums = np.empty(np.shape(packed)[0], dtype=np.int64)
+    for start in range(0, np.shape(packed)[0], 4096):
+        words = packed[start:start + 4096]
+        sums[start:start + 4096] = np.sum(_popcount(words & LOW_BITS), axis=1, dtype=np.int64)
+        sums[start:start + 4096] += 2 * np.sum(_popcount(words & HIGH_BITS), axis=1, dtype=np.int64)
+    return sums
+
+def _jit_kernels():
+    """Imports the numba kernels, which triggers their compilation or loads them from numba's on-disk cache.
+    
+    Returns:
+        module: The module utils._merger_jit, or None if numba is not installed.
+    """
+    try:
+        from . import _merger_jit
+    except ImportError:
+        return None
+    return _merger_jit
+
+def _sum_rows_cuda(array, row_sums):
+    """Computes row sums of a numpy.array on the current CUDA device with CuPy.
+    
+    The array is transferred in chunks of rows that fit into the free device memory.
+    
+    Args:
+        array (numpy.array): A 2D numpy.array.
+        row_sums (callable): Maps a chunk of rows of array, given as a cupy.ndarray, to a cupy.ndarray of int64 row sums.
+        
+    Returns:
+        numpy.array: A numpy.array of dtype int64 containing the row sums of array.
+    """
+    try:
+        import cupy as cp
+    except ImportError:
+        raise ImportError("Computing allele counts on a CUDA device requires CuPy.")
+    num_rows = np.shape(array)[0]
+    sums = np.empty(num_rows, dtype=np.int64)
+    
+    # Besides the chunk itself, the reductions need temporary arrays, so only a fraction of the free memory is used.
+    free_bytes = cp.cuda.Device().mem_info[0]
+    chunk_size = max(1, free_bytes // (32 * max(1, np.shape(array)[1] * array.itemsize)))
+    for start in range(0, num_rows, chunk_size):
+        chunk = cp.asarray(array[start:start + chunk_size])
+        chunk_sums = row_sums(chunk)
+        sums[start:start + chunk_size] = cp.asnumpy(chunk_sums)
+        del chunk, chunk_sums
+    cp.get_default_memory_pool().free_all_blocks()
+    return sums
+
+def _sum_along_inds_cuda_rows(words):
+    """Computes the row sums of a chunk of a genotype packed by pack_genotype_words() that resides on a CUDA device."""
+    sums = swar_popcount(words & LOW_BITS).sum(axis=1, dtype="int64")
+    sums += 2 * swar_popcount(words & HIGH_BITS).sum(axis=1, dtype="int64")
+    return sums
+
+def count_alleles(genotype, device="cpu"):
+    """Computes the number of minor alleles at each SNP of an unpacked genotype.
+    
+    Packing a genotype requires a pass over the unpacked genotype that is more expensive than summing it, 
+    so genotypes that are not packed anyway should be summed directly.
+    
+    Args:
+        genotype (numpy.array): A numpy.array of dtype uint8 with entries from range(3). The rows represent SNPs, the columns represent individuals.
+        device (str): The device the allele counts are computed on. Either "cpu" or "cuda".
+    
+    Returns:
+        numpy.array: A numpy.array of dtype int64 containing the number of minor alleles at each SNP.
+    """
+    if device == "cuda":
+        return _sum_rows_cuda(genotype, lambda chunk: chunk.sum(axis=1, dtype="int64"))
+    
+    # Summing into uint32 is considerably faster than summing into 64-bit integers and cannot overflow for fewer than 2^31 individuals.
+    return np.sum(genotype, axis=1, dtype=np.uint32).astype(np.int64)
+
+def sum_along_inds(packed, device="cpu"):
+    """Computes the number of minor alleles at each SNP of a genotype packed by pack_genotype_words().
+    
+    The genotype g of each individual is stored as 2 bits (h,l) with g = 2h + l, so the row sum of 32 individuals is 
+    popcount(word & 0x5555...) + 2 * popcount(word & 0xAAAA...). For genotypes with at least JIT_MIN_WORDS words, 
+    a parallel numba kernel is used if numba is installed. Smaller genotypes are handled by NumPy, such that short runs 
+    neither import numba nor wait for its compiler. If device is "cuda", the popcounts are computed on the GPU with CuPy.
+    
+    Args:
+        packed (numpy.array): A numpy.array of dtype uint64 as returned by pack_genotype_words().
+        device (str): The device the allele counts are computed on. Either "cpu" or "cuda".
+    
+    Returns:
+        numpy.array: A numpy.array of dtype int64 containing the number of minor alleles at each SNP.
+    """
+    if device == "cuda":
+        return _sum_rows_cuda(packed, _sum_along_inds_cuda_rows)
+    if np.size(packed) >= JIT_MIN_WORDS:
+        jit_kernels = _jit_kernels()
+        if jit_kernels is not None:
+            return jit_kernels.sum_along_inds(packed)
+    return _sum_along_inds_numpy(packed)